@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+HTTP 响应磁盘缓存（sqlite 实现）
+
+两个抓取脚本共用：按 URL 存响应字节、抓取时间和 ETag/Last-Modified
+校验头。单文件 sqlite 替代散落的 .bin/.meta.json 文件对，写入原子；
+多线程抓取时由模块内的锁串行化访问。
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+CACHE_DB = Path(os.getenv("RATE_CACHE_DB", ".cache/http.sqlite"))
+CACHE_TTL = int(os.getenv("RATE_CACHE_TTL", "900"))  # seconds
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS http_cache (
+    url TEXT PRIMARY KEY,
+    body BLOB NOT NULL,
+    fetched_at REAL NOT NULL,
+    etag TEXT,
+    last_modified TEXT
+);
+CREATE TABLE IF NOT EXISTS parsed_cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    stored_at REAL NOT NULL
+)
+"""
+
+_conn: Optional[sqlite3.Connection] = None
+_lock = threading.Lock()
+
+
+def _get_conn() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        CACHE_DB.parent.mkdir(parents=True, exist_ok=True)
+        _conn = sqlite3.connect(CACHE_DB, check_same_thread=False)
+        _conn.executescript(_SCHEMA)
+        _conn.commit()
+    return _conn
+
+
+def load(url: str, ttl: Optional[int] = None) -> Optional[bytes]:
+    """TTL 内返回缓存的响应体，过期或未缓存返回 None"""
+    if ttl is None:
+        ttl = CACHE_TTL
+    try:
+        with _lock:
+            row = _get_conn().execute(
+                "SELECT body, fetched_at FROM http_cache WHERE url = ?",
+                (url,)).fetchone()
+        if row and time.time() - row[1] < ttl:
+            return row[0]
+    except Exception as e:
+        print(f"Warning: cache read failed: {e}")
+    return None
+
+
+def load_stale(url: str) -> Optional[bytes]:
+    """忽略 TTL 返回缓存体（304 再验证后复用）"""
+    try:
+        with _lock:
+            row = _get_conn().execute(
+                "SELECT body FROM http_cache WHERE url = ?",
+                (url,)).fetchone()
+        if row:
+            return row[0]
+    except Exception as e:
+        print(f"Warning: cache read failed: {e}")
+    return None
+
+
+def meta(url: str) -> Dict:
+    """返回 {'ts', 'etag', 'last_modified'}，未缓存时返回空 dict"""
+    try:
+        with _lock:
+            row = _get_conn().execute(
+                "SELECT fetched_at, etag, last_modified FROM http_cache "
+                "WHERE url = ?", (url,)).fetchone()
+        if row:
+            return {"ts": row[0], "etag": row[1], "last_modified": row[2]}
+    except Exception as e:
+        print(f"Warning: cache meta read failed: {e}")
+    return {}
+
+
+def save(url: str, body: bytes,
+         etag: Optional[str] = None,
+         last_modified: Optional[str] = None):
+    """写入/覆盖缓存条目"""
+    try:
+        with _lock:
+            conn = _get_conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO http_cache "
+                "(url, body, fetched_at, etag, last_modified) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (url, body, time.time(), etag, last_modified))
+            conn.commit()
+    except Exception as e:
+        print(f"Warning: cache write failed: {e}")
+
+
+def content_key(body: bytes) -> str:
+    """响应体的短指纹，用作解析结果缓存的键（内容变则键变，天然失效）"""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def load_parsed(key: str):
+    """按内容指纹取回已解析结果；未命中返回 None
+
+    每次命中都从 JSON 反序列化出新对象，调用方可放心就地修改。
+    """
+    try:
+        with _lock:
+            row = _get_conn().execute(
+                "SELECT value FROM parsed_cache WHERE key = ?",
+                (key,)).fetchone()
+        if row:
+            return json.loads(row[0])
+    except Exception as e:
+        print(f"Warning: parsed-cache read failed: {e}")
+    return None
+
+
+def save_parsed(key: str, value):
+    """存入解析结果（value 须可 JSON 序列化）"""
+    try:
+        payload = json.dumps(value, ensure_ascii=False)
+        with _lock:
+            conn = _get_conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO parsed_cache (key, value, stored_at) "
+                "VALUES (?, ?, ?)", (key, payload, time.time()))
+            conn.commit()
+    except Exception as e:
+        print(f"Warning: parsed-cache write failed: {e}")
+
+
+def refresh(url: str):
+    """304 之后刷新抓取时间戳，让 TTL 重新计时"""
+    try:
+        with _lock:
+            conn = _get_conn()
+            conn.execute(
+                "UPDATE http_cache SET fetched_at = ? WHERE url = ?",
+                (time.time(), url))
+            conn.commit()
+    except Exception as e:
+        print(f"Warning: cache refresh failed: {e}")
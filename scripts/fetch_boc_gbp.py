@@ -7,61 +7,229 @@
 - 更好的日志记录
 """
 
+import gzip
+import io
 import json
+import os
+import random
+import re
 import sys
 import time
-from datetime import datetime, timezone
+import zlib
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Dict, Optional
 from urllib.request import Request, urlopen
 from urllib.error import URLError, HTTPError
 
+import _cache
+
+# 北京时间固定 UTC+8，不依赖进程时区
+BEIJING_TZ = timezone(timedelta(hours=8))
+
 try:
-    from bs4 import BeautifulSoup
+    from bs4 import BeautifulSoup, SoupStrainer
 except ImportError:
     print("ERROR: BeautifulSoup not installed. Run: pip install beautifulsoup4")
     sys.exit(1)
 
+# 只把 <tr> 子树构建成解析树，跳过页面上的导航/脚本等无关内容
+ONLY_ROWS = SoupStrainer('tr')
+
+# orjson（Rust 实现）编解码 JSON 比标准库快数倍，且直接产出 bytes；
+# 未安装时回退到 stdlib json
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# brotli 对 text/html 的压缩率通常优于 gzip；只在本地能解压时才向
+# 服务器声明 br，未安装时继续用 gzip/deflate
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+ACCEPT_ENCODING = "br, gzip, deflate" if HAS_BROTLI else "gzip, deflate"
+
+# 优先使用 C 实现的 lxml 解析器（比纯 Python 的 html.parser 快一个数量级），
+# 未安装时自动回退
+try:
+    from lxml import etree
+    HAS_LXML = True
+    BS4_PARSER = "lxml"
+except ImportError:
+    HAS_LXML = False
+    BS4_PARSER = "html.parser"
+
 
 BOC_URL = "https://www.boc.cn/sourcedb/whpj/"
 MAX_RETRIES = 3
-RETRY_DELAY = 5  # seconds
 VALID_RATE_RANGE = (5.0, 15.0)  # 合理汇率范围 CNY per GBP
 
+# 静态请求头只在导入时构建一次；条件请求头（If-None-Match 等）逐次叠加
+BASE_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+    # 压缩传输：中行页面 ~80KB 文本压缩后只剩 10-15KB
+    "Accept-Encoding": ACCEPT_ENCODING,
+}
+
+
+def _backoff_sleep(attempt: int, retry_after: Optional[float] = None):
+    """指数退避 + 随机抖动：0.5s → 1s → 2s …，上限 30s
+
+    固定间隔重试在瞬时故障时恢复慢，在对端过载时又容易踩同一拍。
+    服务器通过 Retry-After 明示等待时长时直接照办（同样封顶 30s）。
+    """
+    if retry_after is not None:
+        delay = min(30.0, retry_after)
+    else:
+        delay = min(30.0, (2 ** attempt) * 0.5) + random.uniform(0, 0.5)
+    print(f"Retrying in {delay:.1f}s...")
+    time.sleep(delay)
+
+
+def _decompress(content: bytes, encoding: Optional[str]) -> bytes:
+    """按 Content-Encoding 解压响应体（urlopen 不会自动处理）"""
+    if encoding == "gzip":
+        return gzip.decompress(content)
+    if encoding == "br" and HAS_BROTLI:
+        return brotli.decompress(content)
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(content)
+        except zlib.error:
+            return zlib.decompress(content, -zlib.MAX_WBITS)
+    return content
+
+
+def fetch_html_with_retry(url: str, retries: int = MAX_RETRIES) -> bytes:
+    """带重试机制的 HTML 获取，返回原始字节（命中本地 TTL 缓存时跳过网络请求）
+
+    不在这里 decode：lxml 和 BeautifulSoup 都直接吃 bytes 并自行处理编码，
+    省掉一次全文解码。
+    """
+    cached = _cache.load(url)
+    if cached is not None:
+        print("Cache hit, skipping network fetch")
+        return cached
+
+    # TTL 过期后用条件请求再验证：内容没变时服务器只回 304，零响应体
+    meta = _cache.meta(url)
+    headers = dict(BASE_HEADERS)
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
 
-def fetch_html_with_retry(url: str, retries: int = MAX_RETRIES) -> str:
-    """带重试机制的 HTML 获取"""
     for attempt in range(retries):
         try:
-            req = Request(url, headers={
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-            })
+            req = Request(url, headers=headers)
             with urlopen(req, timeout=30) as resp:
-                return resp.read().decode("utf-8", errors="ignore")
+                content = _decompress(resp.read(),
+                                      resp.headers.get("Content-Encoding"))
+                etag = resp.headers.get("ETag")
+                last_modified = resp.headers.get("Last-Modified")
+            _cache.save(url, content, etag=etag, last_modified=last_modified)
+            return content
         except (URLError, HTTPError) as e:
+            retry_after = None
+            if isinstance(e, HTTPError):
+                stale = _cache.load_stale(url) if e.code == 304 else None
+                if stale is not None:
+                    print("Not modified (304), reusing cached body")
+                    _cache.refresh(url)
+                    return stale
+                # 4xx（除 429 限流外）不会自愈，重试只是浪费等待时间
+                if 400 <= e.code < 500 and e.code != 429:
+                    raise RuntimeError(f"Client error {e.code} fetching {url}") from e
+                # 限流/过载时服务器可能给出明确的重试间隔
+                if e.code in (429, 503):
+                    try:
+                        retry_after = float(e.headers.get("Retry-After"))
+                    except (TypeError, ValueError):
+                        pass
             print(f"Attempt {attempt + 1}/{retries} failed: {e}")
             if attempt < retries - 1:
-                time.sleep(RETRY_DELAY)
+                _backoff_sleep(attempt, retry_after)
             else:
                 raise RuntimeError(f"Failed to fetch after {retries} attempts") from e
-    return ""
+    return b""
 
 
-def parse_gbp_rate_bs4(html: str) -> Dict:
-    """使用 BeautifulSoup 解析中行英镑汇率"""
-    soup = BeautifulSoup(html, 'html.parser')
-    
-    # 查找所有表格行
-    rows = soup.find_all('tr')
-    
-    for row in rows:
-        cells = row.find_all('td')
-        if len(cells) < 7:
+# 字节级快路径："英镑"在中行页面只出现一次，直接定位它所在的行，
+# 不为整页 30+ 个币种建解析树
+GBP_NEEDLE = '英镑'.encode('utf-8')
+CELL_RE = re.compile(r'<td[^>]*>(.*?)</td>', re.S | re.I)
+TAG_RE = re.compile(r'<[^>]+>')
+
+
+def _fast_gbp_cells(content: bytes) -> Optional[list]:
+    """在"英镑"之后的 4KB 窗口里切出同行单元格；失败返回 None 走完整解析"""
+    idx = content.find(GBP_NEEDLE)
+    if idx < 0:
+        return None
+
+    window = content[idx:idx + 4096].decode('utf-8', errors='ignore')
+    # 截断到行尾，避免吃进下一个币种的单元格
+    row_end = window.find('</tr>')
+    if row_end >= 0:
+        window = window[:row_end]
+
+    cells = [TAG_RE.sub('', c).strip() for c in CELL_RE.findall(window)]
+    if len(cells) < 6:
+        return None
+    # 窗口从货币名称之后开始，补回名称列，保持与表格行相同的列布局
+    return ['英镑'] + cells[:6]
+
+
+def _cell_text(cell) -> str:
+    """bs4 单元格取文本：纯文本格直接拿 .string 标量，嵌套标签才递归"""
+    s = cell.string
+    return s.strip() if s else cell.get_text(strip=True)
+
+
+def _iter_currency_rows(content: bytes):
+    """逐行产出单元格文本列表；优先用 lxml 增量解析
+
+    iterparse 边读边产出 <tr>：调用方在英镑行上 return 之后，页面剩余部分
+    根本不会被解析；每行用完即 clear()，内存有界，不用为 30+ 个币种行
+    建一棵完整的树。两个引擎都直接消费 bytes，编码检测交给 C 解析器。
+    """
+    if HAS_LXML:
+        for _, tr in etree.iterparse(io.BytesIO(content), events=('end',),
+                                     tag='tr', html=True):
+            yield [''.join(td.itertext()).strip() for td in tr.findall('td')]
+            tr.clear()
+        return
+
+    soup = BeautifulSoup(content, BS4_PARSER, parse_only=ONLY_ROWS)
+    for row in soup.find_all('tr'):
+        yield [_cell_text(cell) for cell in row.find_all('td')]
+
+
+def parse_gbp_rate_bs4(content: bytes, now: Optional[datetime] = None) -> Dict:
+    """解析中行英镑汇率（lxml 增量解析快路径，BeautifulSoup 回退）
+
+    now 由调用方传入，整个运行只取一次系统时钟，UTC 和北京时间字符串
+    从同一个时刻格式化。
+    """
+    if now is None:
+        now = datetime.now(timezone.utc)
+
+    def _rows():
+        # 先试字节级快路径；它解析失败时仍会走完整的逐行解析
+        fast = _fast_gbp_cells(content)
+        if fast:
+            yield fast
+        yield from _iter_currency_rows(content)
+
+    for cell_texts in _rows():
+        if len(cell_texts) < 7:
             continue
-        
-        # 提取文本并清理空白
-        cell_texts = [cell.get_text(strip=True) for cell in cells]
-        
+
         # 检查是否为英镑行（货币名称包含"英镑"或"GBP"）
         currency_name = cell_texts[0]
         if '英镑' not in currency_name and 'GBP' not in currency_name:
@@ -89,9 +257,9 @@ def parse_gbp_rate_bs4(html: str) -> Dict:
                 "rate_cny_per_gbp": round(rate_per_1, 4),
                 "rate_cny_per_100_gbp": round(rate_per_100, 2),
                 "publish_time_raw": publish_time,
-                "fetched_at_utc": datetime.now(timezone.utc).isoformat(),
-                "fetched_at_beijing": datetime.now(timezone.utc).astimezone(
-                    tz=None
+                "fetched_at_utc": now.isoformat(),
+                "fetched_at_beijing": now.astimezone(
+                    BEIJING_TZ
                 ).strftime("%Y-%m-%d %H:%M:%S"),
                 "source": BOC_URL,
                 "status": "success"
@@ -109,6 +277,8 @@ def load_previous_data(filepath: Path) -> Optional[Dict]:
     """加载上一次的数据作为备份"""
     try:
         if filepath.exists():
+            if HAS_ORJSON:
+                return orjson.loads(filepath.read_bytes())
             with open(filepath, 'r', encoding='utf-8') as f:
                 return json.load(f)
     except Exception as e:
@@ -116,8 +286,12 @@ def load_previous_data(filepath: Path) -> Optional[Dict]:
     return None
 
 
-def save_data(data: Dict, filepath: Path, previous_data: Optional[Dict] = None):
-    """保存数据，如果失败则保留旧数据"""
+def save_data(data: Dict, filepath: Path, previous_data: Optional[Dict] = None,
+              pretty: bool = False):
+    """保存数据，如果失败则保留旧数据
+
+    默认写紧凑 JSON（机器消费，写得快读得快）；需要人读时加 --pretty。
+    """
     try:
         # 添加变化信息
         if previous_data and 'rate_cny_per_gbp' in previous_data:
@@ -128,9 +302,20 @@ def save_data(data: Dict, filepath: Path, previous_data: Optional[Dict] = None):
             data['rate_change_percent'] = round((change / old_rate) * 100, 2)
         
         filepath.parent.mkdir(parents=True, exist_ok=True)
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        
+        if HAS_ORJSON:
+            option = orjson.OPT_INDENT_2 if pretty else 0
+            payload = orjson.dumps(data, option=option)
+        elif pretty:
+            payload = json.dumps(data, ensure_ascii=False,
+                                 indent=2).encode('utf-8')
+        else:
+            payload = json.dumps(data, ensure_ascii=False,
+                                 separators=(',', ':')).encode('utf-8')
+        # 先写临时文件再原子替换：写到一半崩溃也不会留下半截 JSON
+        tmp = filepath.with_suffix(filepath.suffix + '.tmp')
+        tmp.write_bytes(payload)
+        os.replace(tmp, filepath)
+
         print(f"✓ Successfully saved data to {filepath}")
         print(f"  Rate: 1 GBP = {data['rate_cny_per_gbp']} CNY")
         if 'rate_change' in data:
@@ -145,19 +330,33 @@ def save_data(data: Dict, filepath: Path, previous_data: Optional[Dict] = None):
 
 def main():
     output_path = Path("docs/data.json")
-    
-    print(f"Starting BOC GBP rate fetch at {datetime.now().isoformat()}")
-    
+
+    # 整个运行只取一次系统时钟
+    now = datetime.now(timezone.utc)
+
+    print(f"Starting BOC GBP rate fetch at {now.isoformat()}")
+
     try:
         # 加载之前的数据
         previous_data = load_previous_data(output_path)
-        
-        # 抓取新数据
-        html = fetch_html_with_retry(BOC_URL)
-        data = parse_gbp_rate_bs4(html)
+
+        # 抓取新数据；页面字节与上次相同时直接复用已解析结果，
+        # 只刷新抓取时间戳
+        content = fetch_html_with_retry(BOC_URL)
+        key = _cache.content_key(content)
+        data = _cache.load_parsed(key)
+        if data is not None:
+            print("Parsed-result cache hit, skipping HTML parse")
+            data['fetched_at_utc'] = now.isoformat()
+            data['fetched_at_beijing'] = now.astimezone(
+                BEIJING_TZ).strftime("%Y-%m-%d %H:%M:%S")
+        else:
+            data = parse_gbp_rate_bs4(content, now)
+            _cache.save_parsed(key, data)
         
         # 保存数据
-        save_data(data, output_path, previous_data)
+        save_data(data, output_path, previous_data,
+                  pretty='--pretty' in sys.argv)
         
         print("✓ Task completed successfully")
         sys.exit(0)
@@ -170,7 +369,7 @@ def main():
             error_data = {
                 "status": "error",
                 "error_message": str(e),
-                "fetched_at_utc": datetime.now(timezone.utc).isoformat(),
+                "fetched_at_utc": now.isoformat(),
                 "source": BOC_URL
             }
             try:
@@ -5,12 +5,29 @@
 使用 Playwright 渲染 JavaScript 页面
 """
 
+import functools
+import gzip
+import io
 import json
+import os
+import socket
+import ssl
 import sys
 import re
-from datetime import datetime, timezone
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Dict, Optional, List
+from urllib.request import Request, urlopen
+from urllib.error import URLError, HTTPError
+
+import _cache
+
+# 北京时间固定 UTC+8，不依赖进程时区
+BEIJING_TZ = timezone(timedelta(hours=8))
 
 # 尝试导入 Playwright (用于 JS 渲染)
 try:
@@ -21,22 +38,120 @@ except ImportError:
     print("Warning: Playwright not available, some banks may not work")
 
 try:
-    from bs4 import BeautifulSoup
+    from bs4 import BeautifulSoup, SoupStrainer
 except ImportError:
     print("ERROR: BeautifulSoup not installed. Run: pip install beautifulsoup4")
     sys.exit(1)
 
+# 只把 <tr> 子树构建成解析树，跳过页面上的导航/脚本等无关内容
+ONLY_ROWS = SoupStrainer('tr')
+
+# orjson（Rust 实现）编解码 JSON 比标准库快数倍，且直接产出 bytes；
+# 未安装时回退到 stdlib json
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# brotli 对 text/html 的压缩率通常优于 gzip；只在本地能解压时才向
+# 服务器声明 br（requests/urllib3 检测到 brotli 后会自动声明并解码）
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+ACCEPT_ENCODING = "br, gzip, deflate" if HAS_BROTLI else "gzip, deflate"
+
+# charset_normalizer 单趟扫描给出最可能的编码，替代逐个 decode 试错；
+# 它本身是 requests 的依赖，装了 requests 的环境天然可用
+try:
+    from charset_normalizer import from_bytes as _cn_from_bytes
+    HAS_CHARSET_NORMALIZER = True
+except ImportError:
+    HAS_CHARSET_NORMALIZER = False
+
+# 静态请求头只在导入时构建一次：requests 路径挂到 Session 上，urllib
+# 路径整组复用（Accept-Encoding 单独加，urlopen 不会自动协商压缩，
+# 而 urllib3 会按已安装的解压库自行声明）
+BASE_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+    "Accept": "text/html,application/xhtml+xml",
+    "Accept-Language": "zh-CN,zh;q=0.9",
+}
+
+# 放宽校验的 SSL 上下文只建一次：create_default_context 每次都要载入
+# 系统根证书并做一串 OpenSSL 配置，没必要逐请求重来
+_SSL_CTX = ssl.create_default_context()
+_SSL_CTX.check_hostname = False
+_SSL_CTX.verify_mode = ssl.CERT_NONE
+if hasattr(ssl, 'OP_LEGACY_SERVER_CONNECT'):
+    _SSL_CTX.options |= ssl.OP_LEGACY_SERVER_CONNECT
+else:
+    _SSL_CTX.options |= 0x4
+
+# 优先用 requests.Session 做 HTTP keep-alive：同一主机的重试和 API/页面
+# 双 URL 复用 TCP+TLS 连接，省掉重复握手；未安装时回退到 urllib
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    import urllib3
+    HAS_REQUESTS = True
+except ImportError:
+    HAS_REQUESTS = False
+
+if HAS_REQUESTS:
+    urllib3.disable_warnings()  # 银行站点普遍证书配置老旧，与 urllib 路径一致不校验
+    _SESSION = requests.Session()
+    _SESSION.verify = False
+    # 默认请求头挂在 Session 上，每次 .get() 复用，不再逐请求重建
+    _SESSION.headers.update(BASE_HEADERS)
+    _adapter = HTTPAdapter(
+        pool_connections=8,
+        pool_maxsize=8,
+        max_retries=Retry(total=2, backoff_factor=0.5,
+                          status_forcelist=[429, 500, 502, 503, 504]),
+    )
+    _SESSION.mount("https://", _adapter)
+    _SESSION.mount("http://", _adapter)
+
+# selectolax（C 实现的 HTML5 引擎绑定）解析比 lxml/bs4 都快；优先用新的
+# lexbor 后端，旧版本回退到 Modest 后端，未安装时走 lxml / bs4
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+    HAS_SELECTOLAX = True
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser as SelectolaxParser
+        HAS_SELECTOLAX = True
+    except ImportError:
+        HAS_SELECTOLAX = False
+
+# 优先使用 C 实现的 lxml 解析器（比纯 Python 的 html.parser 快一个数量级），
+# 未安装时自动回退
+try:
+    from lxml import etree
+    HAS_LXML = True
+    BS4_PARSER = "lxml"
+except ImportError:
+    HAS_LXML = False
+    BS4_PARSER = "html.parser"
+
 # 英镑汇率合理范围（仅用于最终验证，不用于筛选）
 VALID_RATE_RANGE = (5.0, 15.0)
 
-# 银行配置
+# 银行配置；可选 ttl 覆盖全局缓存时长（秒）：更新勤的银行设短，
+# 基本只在盘中改价的设长，不设则用 _cache.CACHE_TTL
 BANKS = {
     "BOC": {
         "name": "中国银行",
         "short_name": "中行",
         "url": "https://www.boc.cn/sourcedb/whpj/",
         "color": "#e60012",
-        "needs_js": False
+        "needs_js": False,
+        "ttl": 300  # 中行盘中每隔几分钟刷新报价
     },
     "ICBC": {
         "name": "中国工商银行",
@@ -56,6 +171,8 @@ BANKS = {
         "name": "招商银行",
         "short_name": "招行",
         "url": "https://fx.cmbchina.com/hq/",
+        # 行情页背后的 JSON 接口：几 KB 数据替代整页渲染
+        "api_url": "https://fx.cmbchina.com/api/v1/fx/rate",
         "color": "#c41230",
         "needs_js": True
     },
@@ -70,8 +187,12 @@ BANKS = {
         "name": "中国农业银行",
         "short_name": "农行",
         "url": "https://ewealth.abchina.com/foreignexchange/listprice/",
+        # 挂牌价页面实际就是在前端调这个接口
+        "api_url": "https://ewealth.abchina.com/app/data/api/DataService/"
+                   "ExchangeRateV2",
         "color": "#007f4e",
-        "needs_js": True
+        "needs_js": True,
+        "ttl": 1800  # 农行页面更新稀疏，多缓存省一次 Playwright 渲染
     }
 }
 
@@ -84,19 +205,30 @@ def validate_rate(rate: float, bank_code: str) -> bool:
     return True
 
 
-def make_result(bank_code: str, rate: float, publish_time: str = "") -> Dict:
-    """构建统一的返回结果"""
-    return {
-        "bank_code": bank_code,
-        "bank_name": BANKS[bank_code]["name"],
-        "short_name": BANKS[bank_code]["short_name"],
-        "rate": round(rate, 4),
+# 预构建每家银行的结果模板：make_result 只做一次 copy 加两个动态字段，
+# 不再每次按 bank_code 做多轮 dict 查找
+_RESULT_TEMPLATES = {
+    code: {
+        "bank_code": code,
+        "bank_name": info["name"],
+        "short_name": info["short_name"],
+        "rate": None,
         "rate_type": "现汇卖出价",
-        "publish_time": publish_time,
-        "source_url": BANKS[bank_code]["url"],
-        "color": BANKS[bank_code]["color"],
+        "publish_time": "",
+        "source_url": info["url"],
+        "color": info["color"],
         "status": "success"
     }
+    for code, info in BANKS.items()
+}
+
+
+def make_result(bank_code: str, rate: float, publish_time: str = "") -> Dict:
+    """构建统一的返回结果"""
+    result = _RESULT_TEMPLATES[bank_code].copy()
+    result["rate"] = round(rate, 4)
+    result["publish_time"] = publish_time
+    return result
 
 
 def is_gbp_currency_cell(text: str) -> bool:
@@ -109,38 +241,180 @@ def is_gbp_currency_cell(text: str) -> bool:
     return False
 
 
-def extract_gbp_rate_from_html(html: str, bank_code: str) -> Optional[tuple]:
-    """从HTML中提取英镑汇率 - 简化版：找到英镑行，取较高值作为卖出价"""
-    soup = BeautifulSoup(html, 'html.parser')
+# 正则快路径：不建解析树，直接在原始 HTML 上扫英镑附近的报价
+GBP_TOKEN_RE = re.compile(r'(?:英镑|GBP)', re.IGNORECASE)
+NUM_RE = re.compile(r'(\d+\.\d+)')
+NUM_LOOSE_RE = re.compile(r'(\d+\.?\d*)')
+DATE_RE = re.compile(r'\d{4}[-/]\d{2}[-/]\d{2}(?:\s+\d{2}:\d{2}:\d{2})?')
 
-    # 方法1：查找表格行
-    for row in soup.find_all('tr'):
-        cells = row.find_all(['td', 'th'])  # 也检查 th 元素
-        if not cells:
+# 行级提取：直接在原始 HTML 上切出包含英镑的 <tr>，再拆单元格、去标签，
+# 完全不构建 DOM
+GBP_ROW_RE = re.compile(
+    r'<tr\b[^>]*>(?P<row>(?:(?!</tr>).)*?(?:英镑|GBP)(?:(?!</tr>).)*?)</tr>',
+    re.S | re.I)
+CELL_RE = re.compile(r'<t[dh]\b[^>]*>(.*?)</t[dh]>', re.S | re.I)
+TAG_RE = re.compile(r'<[^>]+>')
+
+# 数字门卫：行里大多数格子是日期、中文或标签，先用廉价 match 排除，
+# 不再把 float() 的 ValueError 当控制流（异常建立/拆除远贵于一次 match）
+FLOATY_RE = re.compile(r'\A\d{1,6}(?:\.\d+)?\Z')
+
+# 单元格文本清洗表：千分位逗号删掉、不断行空格和窄空格换成普通空格；
+# translate 在 C 层单趟完成，替代逐个 .replace 的多次分配
+_CELL_TABLE = str.maketrans({',': '', '\xa0': ' ', ' ': ' '})
+
+
+def _candidate_rates(texts) -> List[float]:
+    """把一串数字字符串归一化成按 1 英镑计的候选汇率
+
+    三条提取路径（正则快路径、表格行、整页正则兜底）共用同一套判定：
+    100外币报价除以 100，直接汇率原样保留，其余丢弃。
+    """
+    rates = []
+    for text in texts:
+        if not FLOATY_RE.match(text):
+            continue
+        val = float(text)
+        # 100外币 = xxx人民币 格式
+        if 100 < val < 2000:
+            rates.append(val / 100.0)
+        # 直接汇率格式 (英镑通常在 8-12 之间，但要留余地)
+        elif 5 < val < 20:
+            rates.append(val)
+    return rates
+
+
+def _regex_fast_path(html: str, bank_code: str) -> Optional[tuple]:
+    """正则扫描提取英镑卖出价，不构建 DOM；失败时返回 None 走解析树
+
+    先按 <tr> 切出英镑所在行并逐格去标签（语义上等价于表格路径），
+    切不出行时退化为"英镑 token 后 500 字符窗口"的粗扫。
+
+    行正则带否定前瞻，回溯空间与输入长度相关；只喂给它英镑 token
+    两侧 2KB 的窗口，而不是整页几百 KB，最多看前 8 个 token。
+    """
+    for i, tok in enumerate(GBP_TOKEN_RE.finditer(html)):
+        if i >= 8:
+            break
+        m = GBP_ROW_RE.search(html[max(0, tok.start() - 2048):
+                                   tok.start() + 2048])
+        if not m:
+            continue
+        cells = [TAG_RE.sub('', c).strip().translate(_CELL_TABLE)
+                 for c in CELL_RE.findall(m.group('row'))]
+        rates = _candidate_rates(cells)
+        if not rates:
             continue
+        # 与表格路径相同的启发式：取最高值作为卖出价
+        rate = max(rates)
+        if validate_rate(rate, bank_code):
+            print(f"    Regex row fast path: {rate}")
+            publish_time = ""
+            for text in cells:
+                if DATE_RE.match(text):
+                    publish_time = text
+                    break
+            return rate, publish_time
+
+    # 粗扫窗口：页面不是规范表格（如脚本内嵌数据）时的快路径
+    m = GBP_TOKEN_RE.search(html)
+    if not m:
+        return None
+
+    snippet = html[m.end():m.end() + 500]
+    rates = _candidate_rates(NUM_RE.findall(snippet)[:10])
+    if not rates:
+        return None
+
+    rate = max(rates)
+    if not validate_rate(rate, bank_code):
+        return None
+
+    print(f"    Regex fast path: {rate}")
+    tm = DATE_RE.search(snippet)
+    return rate, (tm.group(0) if tm else "")
+
 
-        cell_texts = [c.get_text(strip=True).replace(',', '').replace('\xa0', ' ') for c in cells]
-        row_text = ' '.join(cell_texts)
+def _cell_text(cell) -> str:
+    """bs4 单元格取文本：纯文本格直接拿 .string 标量，嵌套标签才递归
 
-        # 检查是否包含英镑
+    get_text 无条件遍历全部子孙节点拼接字符串，是 bs4 最慢的取值 API；
+    这里的表格格大多是 <td>9.48</td> 这种单文本节点。
+    """
+    s = cell.string
+    return s.strip() if s else cell.get_text(strip=True)
+
+
+def _iter_gbp_rows(html: str):
+    """产出包含英镑/GBP 的行的单元格文本列表
+
+    引擎按速度排序：selectolax（lexbor）→ lxml 增量解析 → BeautifulSoup。
+    """
+    if HAS_SELECTOLAX:
+        for tr in SelectolaxParser(html).css('tr'):
+            # 先拿整行文本做廉价判断，只为英镑行做逐格提取；
+            # 页面上 30+ 个其他币种行不再各付一轮单元格遍历
+            row_text = tr.text()
+            if '英镑' not in row_text and 'GBP' not in row_text:
+                continue
+            cell_texts = [
+                c.text(strip=True).translate(_CELL_TABLE)
+                for c in tr.css('td,th')
+            ]
+            if cell_texts:
+                yield cell_texts
+        return
+
+    if HAS_LXML:
+        # 增量解析：边读边产出 <tr>，调用方在英镑行上停住之后，页面剩余
+        # 部分根本不会被解析；每行用完即 clear()，不为整页建树
+        try:
+            for _, tr in etree.iterparse(
+                    io.BytesIO(html.encode('utf-8', 'ignore')),
+                    events=('end',), tag='tr', html=True):
+                # 整行文本先做廉价判断，非英镑行不做逐格提取
+                row_text = ''.join(tr.itertext())
+                cell_texts = None
+                if '英镑' in row_text or 'GBP' in row_text:
+                    cell_texts = [
+                        ''.join(c.itertext()).strip().translate(_CELL_TABLE)
+                        for c in tr.iter('td', 'th')
+                    ]
+                tr.clear()
+                if cell_texts:
+                    yield cell_texts
+            return
+        except Exception as e:
+            print(f"    lxml parse failed, falling back to bs4: {e}")
+
+    soup = BeautifulSoup(html, BS4_PARSER, parse_only=ONLY_ROWS)
+    for row in soup.find_all('tr'):
+        # 整行文本先做廉价判断，非英镑行不做逐格提取
+        row_text = row.get_text()
         if '英镑' not in row_text and 'GBP' not in row_text:
             continue
 
+        cells = row.find_all(['td', 'th'])  # 也检查 th 元素
+        if cells:
+            yield [_cell_text(c).translate(_CELL_TABLE) for c in cells]
+
+
+def extract_gbp_rate_from_html(html: str, bank_code: str) -> Optional[tuple]:
+    """从HTML中提取英镑汇率 - 简化版：找到英镑行，取较高值作为卖出价"""
+    # 快路径：正则直接扫原始文本，省掉整棵解析树；解析树路径做正确性兜底
+    fast = _regex_fast_path(html, bank_code)
+    if fast:
+        return fast
+
+    # 方法1：查找包含英镑的表格行
+    for cell_texts in _iter_gbp_rows(html):
+        if not cell_texts:
+            continue
+
         print(f"    Found GBP row: {cell_texts[:6]}")
 
         # 提取所有数值
-        rates_found = []
-        for text in cell_texts:
-            try:
-                val = float(text)
-                # 100外币 = xxx人民币 格式
-                if 100 < val < 2000:
-                    rates_found.append(val / 100.0)
-                # 直接汇率格式 (英镑通常在 8-12 之间，但要留余地)
-                elif 5 < val < 20:
-                    rates_found.append(val)
-            except ValueError:
-                continue
+        rates_found = _candidate_rates(cell_texts)
 
         if rates_found:
             print(f"    Rates found: {rates_found}")
@@ -152,33 +426,21 @@ def extract_gbp_rate_from_html(html: str, bank_code: str) -> Optional[tuple]:
                 # 尝试提取发布时间
                 publish_time = ""
                 for text in cell_texts:
-                    if re.match(r'\d{4}[-/]\d{2}[-/]\d{2}', text):
+                    if DATE_RE.match(text):
                         publish_time = text
                         break
                 return rate, publish_time
 
     # 方法2：如果表格方法失败，尝试用正则搜索整个页面
     # 找到"英镑"或"GBP"，然后提取附近的所有数字，取最高值作为卖出价
-    gbp_match = re.search(r'(?:英镑|GBP)', html, re.IGNORECASE)
+    gbp_match = GBP_TOKEN_RE.search(html)
     if gbp_match:
         # 提取英镑后面500个字符的内容
         start_pos = gbp_match.end()
         snippet = html[start_pos:start_pos + 500]
 
-        # 找出所有数字
-        numbers = re.findall(r'(\d+\.?\d*)', snippet)
-        rates = []
-        for num_str in numbers[:10]:  # 只看前10个数字
-            try:
-                val = float(num_str)
-                # 100外币格式（如 954.44）
-                if 100 < val < 2000:
-                    rates.append(val / 100.0)
-                # 直接汇率格式（如 9.54）
-                elif 5 < val < 20:
-                    rates.append(val)
-            except ValueError:
-                pass
+        # 找出所有数字（只看前10个）
+        rates = _candidate_rates(NUM_LOOSE_RE.findall(snippet)[:10])
 
         if len(rates) >= 2:
             rate = rates[1]  # 第二个值是卖出价
@@ -194,32 +456,121 @@ def extract_gbp_rate_from_html(html: str, bank_code: str) -> Optional[tuple]:
     return None
 
 
-def fetch_with_playwright(url: str, bank_code: str, timeout: int = 30000) -> Optional[str]:
-    """使用 Playwright 获取 JavaScript 渲染后的页面"""
-    if not HAS_PLAYWRIGHT:
-        return None
+# 只要表格文本，图片/样式/字体/媒体全是白下的流量
+_BLOCKED_RESOURCES = {"image", "stylesheet", "font", "media"}
+
+
+def _render_page(page, url: str, timeout: int) -> str:
+    """加载页面并在英镑行渲染出来的那一刻取走 HTML
 
+    掐掉装饰性子资源后 DOM 就绪快得多；domcontentloaded + 定向等待
+    英镑行替代原来的 networkidle + 固定 2 秒盲等。
+    """
+    page.route("**/*", lambda route: route.abort()
+               if route.request.resource_type in _BLOCKED_RESOURCES
+               else route.continue_())
+    page.goto(url, timeout=timeout, wait_until="domcontentloaded")
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
+        page.wait_for_selector("tr:has-text('英镑'), tr:has-text('GBP')",
+                               timeout=8000)
+    except Exception:
+        # 报价可能不在表格行里，拿当前 DOM 交给后面的正则兜底
+        pass
+    return page.content()
+
+
+def _free_port() -> int:
+    """向内核要一个空闲端口（绑定 0 端口再读回实际分配值）"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class PlaywrightPool:
+    """全程只跑一个 Chromium，多个线程各自轻量连接
+
+    原来每家需要 JS 的银行都冷启动一个 Chromium（1-3 秒 + 数百 MB 内存，
+    5 家就是 5 份）。sync API 的对象绑定在启动它的线程上，Browser 没法
+    直接跨线程共享；Python 客户端也没有 Node 版的 launch_server()，
+    所以这里在主线程 launch() 唯一的浏览器进程并打开它的 CDP 调试端口，
+    worker 线程各自 connect_over_cdp() 到它（毫秒级），再开独立的
+    BrowserContext 渲染，互不串 cookie。
+    """
+
+    def __init__(self):
+        self._pw = sync_playwright().start()
+        try:
+            # PW_CDP 指向外部常驻浏览器（scripts/playwright_daemon.py）时
+            # 直接连过去，连本轮唯一的一次 Chromium 启动也省掉；外部
+            # 浏览器归守护进程管，close() 只收自己启动的
+            self._browser = None
+            cdp_endpoint = os.getenv("PW_CDP")
+            if cdp_endpoint:
+                print(f"  Using external browser: {cdp_endpoint}")
+            else:
+                port = _free_port()
+                self._browser = self._pw.chromium.launch(
+                    headless=True,
+                    args=[f"--remote-debugging-port={port}"])
+                cdp_endpoint = f"http://127.0.0.1:{port}"
+            self.cdp_endpoint = cdp_endpoint
+        except Exception:
+            # 启动失败时别把刚拉起的驱动进程留成孤儿
+            self._pw.stop()
+            raise
+        # 每个 worker 线程一个 sync_playwright 驱动，跨银行复用；
+        # 线程随进程退出，驱动进程由 OS 回收
+        self._local = threading.local()
+
+    def _thread_pw(self):
+        pw = getattr(self._local, 'pw', None)
+        if pw is None:
+            pw = self._local.pw = sync_playwright().start()
+        return pw
+
+    def fetch(self, url: str, timeout: int = 30000) -> Optional[str]:
+        browser = self._thread_pw().chromium.connect_over_cdp(
+            self.cdp_endpoint)
+        try:
             context = browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+                user_agent=BASE_HEADERS["User-Agent"]
             )
             page = context.new_page()
+            html = _render_page(page, url, timeout)
+            context.close()
+            return html
+        finally:
+            browser.close()  # 只断开本线程的连接，浏览器进程继续服务
 
-            print(f"    Loading with Playwright...")
-            page.goto(url, timeout=timeout, wait_until="networkidle")
+    def close(self):
+        try:
+            if self._browser is not None:
+                self._browser.close()
+        finally:
+            self._pw.stop()
 
-            # 等待表格加载
-            try:
-                page.wait_for_selector("table", timeout=10000)
-            except:
-                pass
 
-            # 额外等待一下确保数据加载
-            page.wait_for_timeout(2000)
+def fetch_with_playwright(url: str, bank_code: str, timeout: int = 30000,
+                          pool: Optional[PlaywrightPool] = None) -> Optional[str]:
+    """使用 Playwright 获取 JavaScript 渲染后的页面
+
+    有共享池时走池（连接现成浏览器）；没有时退回每次冷启动。
+    """
+    if not HAS_PLAYWRIGHT:
+        return None
+
+    try:
+        print(f"    Loading with Playwright...")
+        if pool is not None:
+            return pool.fetch(url, timeout)
 
-            html = page.content()
+        with sync_playwright() as p:
+            browser = p.chromium.launch(headless=True)
+            context = browser.new_context(
+                user_agent=BASE_HEADERS["User-Agent"]
+            )
+            page = context.new_page()
+            html = _render_page(page, url, timeout)
             browser.close()
             return html
     except Exception as e:
@@ -227,44 +578,181 @@ def fetch_with_playwright(url: str, bank_code: str, timeout: int = 30000) -> Opt
         return None
 
 
+# HTML 头部的 charset 声明（国内银行页面基本都带）
+_CHARSET_META_RE = re.compile(rb'charset=["\']?([\w-]+)', re.I)
+
+# 英镑标识的各编码字节形态；gbk 形态同时覆盖 gb2312/gb18030
+_GBP_NEEDLES = (b'GBP', '英镑'.encode('utf-8'), '英镑'.encode('gbk'))
+
+
+def _contains_gbp_bytes(content: bytes) -> bool:
+    """原始字节上的存在性检查：页面里没英镑就不值得整页解码"""
+    return any(needle in content for needle in _GBP_NEEDLES)
+
+
+def _decode_if_gbp(content: bytes) -> Optional[str]:
+    """先在字节层确认英镑存在再解码；不存在直接放弃这个页面"""
+    if not _contains_gbp_bytes(content):
+        print("    GBP not present in page bytes, skipping decode")
+        return None
+    return _decode_html(content)
+
+
+def _decode_html(content: bytes) -> str:
+    """把响应字节解码成 str，尽量只做一次全文扫描
+
+    旧实现按 utf-8 → gbk → gb2312 → gb18030 逐个整页试错，GBK 页面
+    要先白扫两遍。现在优先读页面自己声明的 charset，其次用
+    charset_normalizer 单趟检测，最后才退回试错链。
+    """
+    m = _CHARSET_META_RE.search(content[:2048])
+    if m:
+        try:
+            return content.decode(m.group(1).decode('ascii').lower())
+        except (UnicodeDecodeError, LookupError):
+            pass
+    if HAS_CHARSET_NORMALIZER:
+        best = _cn_from_bytes(content).best()
+        if best is not None:
+            return str(best)
+    # gb18030 是 gbk/gb2312 的超集，试错链只需三步
+    for encoding in ('utf-8', 'gbk', 'gb18030'):
+        try:
+            return content.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return content.decode('utf-8', errors='ignore')
+
+
+def _decompress(content: bytes, encoding: Optional[str]) -> bytes:
+    """按 Content-Encoding 解压响应体（urlopen 不会自动处理）"""
+    if encoding == "gzip":
+        return gzip.decompress(content)
+    if encoding == "br" and HAS_BROTLI:
+        return brotli.decompress(content)
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(content)
+        except zlib.error:
+            return zlib.decompress(content, -zlib.MAX_WBITS)
+    return content
+
+
 def fetch_with_urllib(url: str) -> Optional[str]:
     """使用 urllib 获取页面（用于静态页面）"""
-    import ssl
-    from urllib.request import Request, urlopen
-    from urllib.error import URLError, HTTPError
-
-    # 创建允许旧 SSL 的上下文
-    ssl_context = ssl.create_default_context()
-    ssl_context.check_hostname = False
-    ssl_context.verify_mode = ssl.CERT_NONE
-    if hasattr(ssl, 'OP_LEGACY_SERVER_CONNECT'):
-        ssl_context.options |= ssl.OP_LEGACY_SERVER_CONNECT
-    else:
-        ssl_context.options |= 0x4
-
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-        "Accept": "text/html,application/xhtml+xml",
-        "Accept-Language": "zh-CN,zh;q=0.9",
-    }
+    headers = dict(BASE_HEADERS)
+    headers["Accept-Encoding"] = ACCEPT_ENCODING
+
+    # TTL 过期后用条件请求再验证：内容没变时服务器只回 304，零响应体
+    meta = _cache.meta(url)
+    cond_headers = {}
+    if meta.get("etag"):
+        cond_headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        cond_headers["If-Modified-Since"] = meta["last_modified"]
+    headers.update(cond_headers)
+
+    # 连接池路径：Session 复用连接，重试交给 urllib3 的 Retry
+    if HAS_REQUESTS:
+        try:
+            resp = _SESSION.get(url, headers=cond_headers, timeout=30)
+            stale = _cache.load_stale(url) if resp.status_code == 304 else None
+            if stale is not None:
+                print("    Not modified (304), reusing cached body")
+                _cache.refresh(url)
+                return _decode_if_gbp(stale)
+            resp.raise_for_status()
+            content = resp.content
+            _cache.save(url, content,
+                        etag=resp.headers.get("ETag"),
+                        last_modified=resp.headers.get("Last-Modified"))
+            return _decode_if_gbp(content)
+        except Exception as e:
+            print(f"    requests error, falling back to urllib: {e}")
 
     try:
         req = Request(url, headers=headers)
-        with urlopen(req, timeout=30, context=ssl_context) as resp:
-            content = resp.read()
-            # 尝试多种编码
-            for encoding in ['utf-8', 'gbk', 'gb2312', 'gb18030']:
-                try:
-                    return content.decode(encoding)
-                except UnicodeDecodeError:
-                    continue
-            return content.decode('utf-8', errors='ignore')
-    except (URLError, HTTPError) as e:
+        with urlopen(req, timeout=30, context=_SSL_CTX) as resp:
+            content = _decompress(resp.read(),
+                                  resp.headers.get("Content-Encoding"))
+            etag = resp.headers.get("ETag")
+            last_modified = resp.headers.get("Last-Modified")
+        _cache.save(url, content, etag=etag, last_modified=last_modified)
+        return _decode_if_gbp(content)
+    except HTTPError as e:
+        stale = _cache.load_stale(url) if e.code == 304 else None
+        if stale is not None:
+            print("    Not modified (304), reusing cached body")
+            _cache.refresh(url)
+            return _decode_if_gbp(stale)
+        print(f"    urllib error: {e}")
+        return None
+    except URLError as e:
         print(f"    urllib error: {e}")
         return None
 
 
-def fetch_bank(bank_code: str) -> Optional[Dict]:
+def _extract_rate_from_json(obj, bank_code: str) -> Optional[tuple]:
+    """在任意形状的 JSON 里找英镑条目，套用与 HTML 路径相同的候选判定
+
+    各行接口的字段名五花八门（rtsOfr / SellPrice / …），不硬编码：
+    递归定位字符串值里含 英镑/GBP 的 dict，把该条目的全部标量值交给
+    _candidate_rates，取最高者作为卖出价。
+    """
+    if isinstance(obj, dict):
+        texts = [v for v in obj.values() if isinstance(v, str)]
+        if '英镑' in (joined := ' '.join(texts)) or 'GBP' in joined:
+            nums = [str(v) for v in obj.values()
+                    if isinstance(v, (int, float)) and not isinstance(v, bool)]
+            rates = _candidate_rates(texts + nums)
+            if rates:
+                rate = max(rates)
+                if validate_rate(rate, bank_code):
+                    publish_time = ""
+                    for text in texts:
+                        m = DATE_RE.search(text)
+                        if m:
+                            publish_time = m.group(0)
+                            break
+                    return rate, publish_time
+        values = obj.values()
+    elif isinstance(obj, list):
+        values = obj
+    else:
+        return None
+
+    for value in values:
+        found = _extract_rate_from_json(value, bank_code)
+        if found:
+            return found
+    return None
+
+
+def _fetch_via_api(bank_code: str, api_url: str) -> Optional[Dict]:
+    """直接打银行页面背后的 JSON 接口，绕开 Playwright 渲染
+
+    复用 fetch_with_urllib，顺带继承它的缓存、条件请求和字节级英镑
+    门卫；接口挂了或改了形状就返回 None，调用方照常走页面路径。
+    """
+    body = fetch_with_urllib(api_url)
+    if not body:
+        return None
+    try:
+        data = orjson.loads(body) if HAS_ORJSON else json.loads(body)
+    except Exception as e:
+        print(f"    API JSON decode failed: {e}")
+        return None
+
+    found = _extract_rate_from_json(data, bank_code)
+    if found:
+        rate, publish_time = found
+        print(f"  ✓ {bank_code}: {rate} (API)")
+        return make_result(bank_code, rate, publish_time)
+    return None
+
+
+def fetch_bank(bank_code: str,
+               pool: Optional[PlaywrightPool] = None) -> Optional[Dict]:
     """获取单个银行的汇率"""
     config = BANKS[bank_code]
     url = config["url"]
@@ -273,13 +761,50 @@ def fetch_bank(bank_code: str) -> Optional[Dict]:
     print(f"Fetching {bank_code} ({config['short_name']})...")
     print(f"  URL: {url}")
 
-    html = None
+    # 有 JSON 接口的银行先走接口：几 KB 数据替代整页抓取/渲染
+    api_url = config.get("api_url")
+    if api_url:
+        result = _fetch_via_api(bank_code, api_url)
+        if result:
+            return result
+        print("    API path empty, falling back to page fetch")
 
-    # 如果需要 JavaScript 渲染
-    if needs_js and HAS_PLAYWRIGHT:
-        html = fetch_with_playwright(url, bank_code)
+    html = None
 
-    # 如果 Playwright 失败或不需要 JS，尝试普通请求
+    # TTL 内直接复用上次的页面，跳过 Playwright 和网络请求
+    cached = _cache.load(url, ttl=config.get("ttl"))
+    if cached is not None:
+        print("    Cache hit, skipping network fetch")
+        html = _decode_if_gbp(cached)
+
+    # 投机并行：不少"需要 JS"的银行静态 HTML 里其实就带报价，同时发起
+    # 渲染和普通请求两路，谁先拿到含英镑的页面用谁，慢的一路直接放弃
+    if not html and needs_js and HAS_PLAYWRIGHT:
+        racer = ThreadPoolExecutor(max_workers=2)
+        futures = {
+            racer.submit(fetch_with_playwright, url, bank_code, pool=pool):
+                'playwright',
+            racer.submit(fetch_with_urllib, url): 'urllib',
+        }
+        try:
+            for future in as_completed(futures):
+                try:
+                    candidate = future.result()
+                except Exception as e:
+                    print(f"    {futures[future]} racer failed: {e}")
+                    continue
+                if candidate and ('英镑' in candidate or 'GBP' in candidate):
+                    html = candidate
+                    print(f"    Race won by {futures[future]}")
+                    # urllib 路径自己写缓存，渲染结果在这里补写
+                    if futures[future] == 'playwright':
+                        _cache.save(url, html.encode('utf-8'))
+                    break
+        finally:
+            racer.shutdown(wait=False, cancel_futures=True)
+
+    # 静态银行、Playwright 不可用或两路都空手时的普通请求
+    # （自带缓存与条件请求，竞速刚写过缓存的话直接命中）
     if not html:
         html = fetch_with_urllib(url)
 
@@ -295,10 +820,20 @@ def fetch_bank(bank_code: str) -> Optional[Dict]:
         print(f"  ✗ {bank_code}: GBP not found in page")
         return None
 
+    # 解析结果缓存：同一发布周期内页面字节往往不变，指纹命中就跳过
+    # 全部正则/DOM 工作；HTML 一变指纹即变，无需显式失效
+    key = _cache.content_key(html.encode('utf-8', 'ignore'))
+    cached_parsed = _cache.load_parsed(key)
+    if cached_parsed is not None:
+        rate, publish_time = cached_parsed
+        print(f"  ✓ {bank_code}: {rate} (parsed-cache hit)")
+        return make_result(bank_code, rate, publish_time)
+
     # 提取汇率
     result = extract_gbp_rate_from_html(html, bank_code)
     if result:
         rate, publish_time = result
+        _cache.save_parsed(key, [rate, publish_time])
         print(f"  ✓ {bank_code}: {rate}")
         return make_result(bank_code, rate, publish_time)
 
@@ -306,27 +841,101 @@ def fetch_bank(bank_code: str) -> Optional[Dict]:
     return None
 
 
-def fetch_all_banks() -> List[Dict]:
-    """获取所有银行汇率"""
+def fetch_all_banks(previous_data: Optional[Dict] = None) -> List[Dict]:
+    """并发获取所有银行汇率
+
+    抓取是纯 I/O 等待（网络 + Playwright 渲染），串行时总耗时是各银行之和；
+    线程池让总耗时接近最慢一家的耗时。每个线程独立启动自己的
+    sync_playwright 实例，互不共享，线程安全。
+
+    拿到 MIN_BANKS 家成功结果或超过 FETCH_DEADLINE 秒后就不再等剩余银行，
+    让尾延迟由最快的几家决定，而不是最慢的一家。没赶上这一轮的银行用
+    previous_data 里的上次报价垫底并标记 status='timeout'。
+    """
+    min_banks = int(os.getenv('MIN_BANKS', '4'))
+    deadline = float(os.getenv('FETCH_DEADLINE', '90'))
     results = []
 
-    for bank_code in BANKS:
+    # 共享浏览器池：整个运行只启动一个 Chromium 进程
+    pool = None
+    if HAS_PLAYWRIGHT:
+        try:
+            pool = PlaywrightPool()
+        except Exception as e:
+            print(f"  Shared browser unavailable, "
+                  f"falling back to per-bank launch: {e}")
+
+    executor = ThreadPoolExecutor(max_workers=len(BANKS))
+    futures = {executor.submit(fetch_bank, code, pool): code for code in BANKS}
+    pending = set(futures)
+
+    def _collect(future):
+        bank_code = futures[future]
         try:
-            result = fetch_bank(bank_code)
+            result = future.result()
             if result:
                 results.append(result)
         except Exception as e:
             print(f"  ✗ {bank_code}: Exception - {e}")
 
+    try:
+        for future in as_completed(futures, timeout=deadline):
+            pending.discard(future)
+            _collect(future)
+
+            if len(results) >= min_banks:
+                print(f"  Quorum of {min_banks} banks reached, "
+                      f"not waiting for the rest")
+                break
+    except FuturesTimeoutError:
+        print(f"  Deadline of {deadline}s reached with {len(results)} banks")
+    finally:
+        # 凑满法定数/到截止线时，别把已经跑完但还没消费的结果扔掉；
+        # 零等待收割，只有真正还在跑的银行才走下面的垫底逻辑
+        for future in list(pending):
+            if future.done() and not future.cancelled():
+                pending.discard(future)
+                _collect(future)
+        # 已开跑的线程无法强停，但不再等待；未启动的 future 直接取消
+        executor.shutdown(wait=False, cancel_futures=True)
+        # 结果已收齐，直接关掉共享浏览器；被放弃的渲染会就地报错退出
+        if pool is not None:
+            try:
+                pool.close()
+            except Exception as e:
+                print(f"  Warning: browser pool close failed: {e}")
+
+    # 慢的那几家不至于在页面上开天窗：沿用上一轮报价，状态标成 timeout
+    if previous_data:
+        fetched = {r['bank_code'] for r in results}
+        for prev in previous_data.get('banks', []):
+            code = prev.get('bank_code')
+            if code in fetched or code not in BANKS or not prev.get('rate'):
+                continue
+            stale = make_result(code, prev['rate'], prev.get('publish_time', ''))
+            stale['status'] = 'timeout'
+            results.append(stale)
+            print(f"  ~ {code}: reusing previous rate (timed out this run)")
+
     return results
 
 
+@functools.lru_cache(maxsize=4)
+def _load_previous_cached(path_str: str, mtime_ns: int) -> Dict:
+    """按 (路径, mtime) 记忆化：文件没变时复用上次解析结果，不再重读 JSON"""
+    filepath = Path(path_str)
+    if HAS_ORJSON:
+        return orjson.loads(filepath.read_bytes())
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
 def load_previous_data(filepath: Path) -> Optional[Dict]:
     """加载上一次的数据"""
     try:
         if filepath.exists():
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return _load_previous_cached(str(filepath),
+                                         filepath.stat().st_mtime_ns)
     except Exception as e:
         print(f"Warning: Could not load previous data: {e}")
     return None
@@ -337,26 +946,42 @@ def calculate_changes(current_banks: List[Dict], previous_data: Optional[Dict])
     if not previous_data or 'banks' not in previous_data:
         return current_banks
 
-    prev_banks = {b['bank_code']: b for b in previous_data.get('banks', [])}
+    # 只抽 {bank_code: rate} 索引，当前列表单趟遍历即可完成 join；
+    # 无效旧价在建索引时就滤掉，循环里不再带哨兵默认值
+    prev_rates = {
+        b['bank_code']: b['rate']
+        for b in previous_data.get('banks', ())
+        if b.get('rate')
+    }
 
     for bank in current_banks:
-        code = bank['bank_code']
-        if code in prev_banks:
-            old_rate = prev_banks[code].get('rate', 0)
-            new_rate = bank['rate']
-            if old_rate > 0:
-                change = new_rate - old_rate
-                bank['rate_change'] = round(change, 4)
-                bank['rate_change_percent'] = round((change / old_rate) * 100, 2)
+        old_rate = prev_rates.get(bank['bank_code'])
+        if old_rate:
+            diff = bank['rate'] - old_rate
+            bank['rate_change'] = round(diff, 4)
+            bank['rate_change_percent'] = round(diff * 100.0 / old_rate, 2)
 
     return current_banks
 
 
-def save_data(data: Dict, filepath: Path):
-    """保存数据"""
+def save_data(data: Dict, filepath: Path, pretty: bool = False):
+    """保存数据
+
+    默认写紧凑 JSON（机器消费，写得快读得快）；需要人读时加 --pretty。
+    """
     filepath.parent.mkdir(parents=True, exist_ok=True)
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    if HAS_ORJSON:
+        option = orjson.OPT_INDENT_2 if pretty else 0
+        payload = orjson.dumps(data, option=option)
+    elif pretty:
+        payload = json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+    else:
+        payload = json.dumps(data, ensure_ascii=False,
+                             separators=(',', ':')).encode('utf-8')
+    # 先写临时文件再原子替换：写到一半崩溃也不会留下半截 JSON
+    tmp = filepath.with_suffix(filepath.suffix + '.tmp')
+    tmp.write_bytes(payload)
+    os.replace(tmp, filepath)
     print(f"✓ Saved to {filepath}")
 
 
@@ -371,7 +996,7 @@ def main():
         previous_data = load_previous_data(output_path)
 
         print("\nFetching from all banks...")
-        banks = fetch_all_banks()
+        banks = fetch_all_banks(previous_data)
 
         print(f"\nFetched {len(banks)} banks successfully")
 
@@ -379,8 +1004,9 @@ def main():
             raise RuntimeError("Failed to fetch any bank rates")
 
         banks = calculate_changes(banks, previous_data)
+        # 按汇率升序排好后首位就是最优，不用再单独跑一遍 min()
         banks.sort(key=lambda x: x['rate'])
-        best = min(banks, key=lambda x: x['rate']) if banks else None
+        best = banks[0] if banks else None
 
         now = datetime.now(timezone.utc)
         data = {
@@ -392,11 +1018,11 @@ def main():
             "banks": banks,
             "bank_count": len(banks),
             "fetched_at_utc": now.isoformat(),
-            "fetched_at_beijing": now.strftime("%Y-%m-%d %H:%M:%S"),
+            "fetched_at_beijing": now.astimezone(BEIJING_TZ).strftime("%Y-%m-%d %H:%M:%S"),
             "status": "success"
         }
 
-        save_data(data, output_path)
+        save_data(data, output_path, pretty='--pretty' in sys.argv)
 
         print("\n" + "=" * 60)
         print(f"Summary: {len(banks)}/6 banks")
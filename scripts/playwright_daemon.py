@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+常驻 Playwright 浏览器服务
+
+反复运行抓取脚本时，每个进程冷启动 Chromium 都要 1-3 秒；把浏览器挂成
+常驻服务后，抓取脚本连接现成实例只要几十毫秒。Python 客户端没有
+Node 版的 launch_server()，所以这里用 Chromium 自带的 CDP 调试端口
+对外提供服务。用法：
+
+    python scripts/playwright_daemon.py > /tmp/pw_cdp &
+    PW_CDP=$(head -1 /tmp/pw_cdp) python scripts/fetch_multi_bank.py
+
+fetch_multi_bank.py 检测到 PW_CDP 环境变量时直接 connect_over_cdp()
+这个服务，不再自己启动浏览器；每次抓取仍然各开独立的 BrowserContext，
+互不串状态。
+"""
+
+import socket
+import sys
+import time
+
+try:
+    from playwright.sync_api import sync_playwright
+except ImportError:
+    print("ERROR: Playwright not installed. Run: pip install playwright")
+    sys.exit(1)
+
+
+def _free_port() -> int:
+    """向内核要一个空闲端口（绑定 0 端口再读回实际分配值）"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def main():
+    with sync_playwright() as p:
+        port = _free_port()
+        browser = p.chromium.launch(
+            headless=True,
+            args=[f"--remote-debugging-port={port}"])
+        # 第一行输出就是 endpoint，方便 PW_CDP=$(head -1 ...) 取用
+        print(f"http://127.0.0.1:{port}", flush=True)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            browser.close()
+
+
+if __name__ == "__main__":
+    main()